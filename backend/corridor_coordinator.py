@@ -0,0 +1,264 @@
+import sys, json, math, heapq, random, argparse, threading
+from collections import deque
+
+# ==== CONFIG ==== #
+PLATOON_EVERY = 90          # seconds between platoons entering the simulated corridor
+LOOKAHEAD = 6               # seconds before a platoon arrives that its lane gets the bias
+GREENWAVE_BOOST = 8.0       # extra weight for a lane with a platoon arriving
+MAX_PLATOON_HOLD = 20       # seconds of a platoon window that may claim the green
+MAX_CROSS_RED = 60          # once an occupied lane has been red this long, platoons get no bias
+# ================ #
+
+LANES = ["Lane1", "Lane2", "Lane3", "Lane4"]
+
+
+class Corridor:
+    """
+    Links between junctions and the phase schedules they publish.
+
+    A link says: vehicles leaving `up` on `from_lane` reach `down` on
+    `to_lane` after `travel_time` seconds. When a junction publishes a
+    green, only the junctions directly downstream of it are marked dirty,
+    and their arrival windows are rebuilt the next time they are read,
+    so one publish costs O(links touched) no matter how big the corridor is.
+    """
+
+    def __init__(self, boost=GREENWAVE_BOOST, max_hold=MAX_PLATOON_HOLD, max_cross_red=MAX_CROSS_RED):
+        self.boost = boost
+        self.max_hold = max_hold
+        self.max_cross_red = max_cross_red
+        self.downstream = {}    # up -> [(down, from_lane, to_lane, travel_time)]
+        self.upstream = {}      # down -> [(up, from_lane, to_lane, travel_time)]
+        self.schedules = {}     # (junction, lane) -> (start_ts, green)
+        self.windows = {}       # junction -> [(to_lane, arrive_ts, green)]
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self.junction = None    # this site's own id when loaded from a per-site corridor.json
+
+    @classmethod
+    def from_file(cls, path):
+        """corridor.json: {"junction": "J2", "links": [{"from": "J1", "to": "J2", "travel_time": 25, ...}]}"""
+        with open(path, encoding="utf-8") as fp:
+            cfg = json.load(fp)
+        corridor = cls()
+        corridor.junction = cfg.get("junction")
+        for link in cfg.get("links", []):
+            corridor.link(link["from"], link["to"], link["travel_time"],
+                          link.get("from_lane", "Lane1"), link.get("to_lane", "Lane1"))
+        return corridor
+
+    def link(self, up, down, travel_time, from_lane="Lane1", to_lane="Lane1"):
+        with self.lock:
+            self.downstream.setdefault(up, []).append((down, from_lane, to_lane, travel_time))
+            self.upstream.setdefault(down, []).append((up, from_lane, to_lane, travel_time))
+            self.dirty.add(down)
+
+    def publish(self, junction, lane, start_ts, green):
+        """
+        Record that `lane` at `junction` turned green at start_ts (epoch
+        seconds, so junction clocks must be in sync) for `green` seconds.
+        """
+        with self.lock:
+            self.schedules[(junction, lane)] = (start_ts, green)
+            for down, from_lane, _, _ in self.downstream.get(junction, []):
+                if from_lane == lane:
+                    self.dirty.add(down)
+
+    def _rebuild(self, junction):
+        windows = []
+        for up, from_lane, to_lane, travel in self.upstream.get(junction, []):
+            sched = self.schedules.get((up, from_lane))
+            if sched is None:
+                continue
+            start, green = sched
+            windows.append((to_lane, start + travel, green))
+        self.windows[junction] = windows
+        self.dirty.discard(junction)
+
+    def arrivals(self, junction, now):
+        """
+        Expected platoon arrivals at junction as (lane, seconds_until, duration).
+        Only greens upstream actually published count: each one releases a
+        platoon that arrives travel_time later and is gone once the window
+        start + travel .. start + travel + green has passed.
+        """
+        with self.lock:
+            if junction in self.dirty:
+                self._rebuild(junction)
+            windows = self.windows.get(junction, [])
+        return [(lane, arrive - now, green) for lane, arrive, green in windows if now < arrive + green]
+
+    def _claims(self, junction, now):
+        # platoons close enough to bias this decision, each held for at most max_hold
+        for lane, until, duration in self.arrivals(junction, now):
+            hold = min(duration, self.max_hold)
+            if -hold < until <= LOOKAHEAD:
+                yield lane, until, hold
+
+    def weights(self, junction, now, longest_red=0):
+        """
+        Per-lane multipliers, same shape as rush_hour_weight(). longest_red is
+        how long the longest-waiting occupied lane has been red; past
+        max_cross_red the platoon bias is dropped so cross streets get served.
+        """
+        w = [1.0, 1.0, 1.0, 1.0]
+        if longest_red > self.max_cross_red:
+            return w
+        for lane, _, _ in self._claims(junction, now):
+            if lane in LANES:
+                w[LANES.index(lane)] += self.boost
+        return w
+
+    def green_for(self, junction, lane, now, green, max_green):
+        """Stretch a green so it covers the platoon heading for this lane, up to max_green."""
+        for to_lane, until, hold in self._claims(junction, now):
+            if to_lane == lane:
+                green = max(green, min(max_green, int(math.ceil(until + hold))))
+        return green
+
+
+# ---- Simulation ---- #
+class SimJunction:
+    """Stand-in for traffic_optimizer.py: same lane choice, fairness and green clamp."""
+
+    def __init__(self, jid, rng, side_rate, min_green=7, max_green=40, max_same_lane=3):
+        self.jid = jid
+        self.rng = rng
+        self.side_rate = side_rate
+        self.min_green, self.max_green, self.max_same_lane = min_green, max_green, max_same_lane
+        self.queues = [deque() for _ in LANES]     # (arrival_ts, vehicle or None for cross traffic)
+        self.active = None
+        self.green_until = 0
+        self.last_lane = None
+        self.repeat_count = 0
+        self.red_since = [0] * len(LANES)
+
+    def choose(self, now, corridor):
+        if self.active is not None:
+            self.red_since[self.active] = now     # the lane whose green just ended
+        ir = [1 if q else 0 for q in self.queues]
+        # softmax over presence, like the lane model on binary IR input
+        probs = [math.exp(2 * v) for v in ir]
+        longest_red = max([now - self.red_since[i] for i in range(4) if ir[i]], default=0)
+        w = corridor.weights(self.jid, now, longest_red) if corridor else [1.0] * 4
+        weighted = [p * x for p, x in zip(probs, w)]
+        order = sorted(range(4), key=lambda i: -weighted[i])
+        lane = order[0]
+        self.repeat_count = self.repeat_count + 1 if self.last_lane == lane else 0
+        if self.repeat_count >= self.max_same_lane:
+            lane = next(i for i in order if i != self.last_lane)
+        self.last_lane = lane
+
+        total = sum(ir)
+        green = self.min_green + 2 * len(self.queues[lane])
+        green = max(self.min_green, min(self.max_green, green))
+        if total >= 3:
+            green = min(self.max_green, green + 5)
+        if total == 0:
+            green = self.min_green
+        if corridor:
+            green = corridor.green_for(self.jid, LANES[lane], now, green, self.max_green)
+        return lane, green
+
+
+def simulate(n_junctions=10, duration=3600, coordinated=True, seed=1,
+             travel_time=25, platoon_every=PLATOON_EVERY, platoon_size=8, side_rate=0.05,
+             boost=GREENWAVE_BOOST, max_hold=MAX_PLATOON_HOLD, max_cross_red=MAX_CROSS_RED):
+    """
+    Straight corridor J0 -> J1 -> ... where Lane1 is the eastbound arterial.
+    Platoons enter at J0 every platoon_every seconds; other lanes get random
+    cross traffic. One vehicle leaves a green lane per second.
+    Returns arterial stats (mean stops and mean delay over free-flow
+    travel per vehicle) and what it cost cross streets (mean and longest
+    wait per vehicle, counting vehicles still queued at the end).
+    """
+    rng = random.Random(seed)
+    corridor = Corridor(boost, max_hold, max_cross_red) if coordinated else None
+    ids = [f"J{i}" for i in range(n_junctions)]
+    if corridor:
+        for a, b in zip(ids, ids[1:]):
+            corridor.link(a, b, travel_time)
+    junctions = [SimJunction(j, random.Random(rng.random()), side_rate) for j in ids]
+    in_transit = []     # heap of (arrive_ts, tiebreak, junction_idx, vehicle)
+    vehicles = []       # [entered_ts, stops, exited_ts]
+    cross_waits = []
+
+    for now in range(duration):
+        # arterial platoons & cross traffic
+        if now % platoon_every == 0:
+            for k in range(platoon_size):
+                v = [now + k, 0, None]
+                vehicles.append(v)
+                heapq.heappush(in_transit, (now + k, len(vehicles), 0, v))
+        for j in junctions:
+            for lane in (1, 2, 3):
+                if j.rng.random() < j.side_rate:
+                    j.queues[lane].append((now, None))
+
+        while in_transit and in_transit[0][0] <= now:
+            _, _, idx, v = heapq.heappop(in_transit)
+            junctions[idx].queues[0].append((now, v))
+
+        for idx, j in enumerate(junctions):
+            if now >= j.green_until:
+                j.active, green = j.choose(now, corridor)
+                j.green_until = now + green
+                if corridor:
+                    corridor.publish(j.jid, LANES[j.active], now, green)
+            for lane, q in enumerate(j.queues):
+                if not q:
+                    continue
+                arr, v = q[0]
+                if lane == j.active:
+                    q.popleft()
+                    if v is None:
+                        cross_waits.append(now - arr)
+                        continue
+                    if arr < now:
+                        v[1] += 1   # had to wait at this junction
+                    if idx + 1 < len(junctions):
+                        heapq.heappush(in_transit, (now + travel_time, id(v), idx + 1, v))
+                    else:
+                        v[2] = now
+
+    done = [v for v in vehicles if v[2] is not None]
+    ideal = (n_junctions - 1) * travel_time
+    for j in junctions:
+        cross_waits += [duration - arr for q in j.queues[1:] for arr, _ in q]
+    return {
+        "vehicles": len(done),
+        "mean_stops": sum(v[1] for v in done) / max(1, len(done)),
+        "mean_delay": sum(v[2] - v[0] - ideal for v in done) / max(1, len(done)),
+        "cross_mean_wait": sum(cross_waits) / max(1, len(cross_waits)),
+        "cross_max_wait": max(cross_waits, default=0),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate green-wave coordination on a simulated corridor")
+    parser.add_argument("--junctions", type=int, default=10)
+    parser.add_argument("--duration", type=int, default=3600, help="simulated seconds")
+    parser.add_argument("--travel-time", type=int, default=25)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--boost", type=float, default=GREENWAVE_BOOST, help="platoon lane weight bonus")
+    parser.add_argument("--hold", type=int, default=MAX_PLATOON_HOLD, help="max seconds a platoon holds green")
+    parser.add_argument("--max-cross-red", type=int, default=MAX_CROSS_RED,
+                        help="seconds an occupied lane may wait before platoons lose their bias")
+    args = parser.parse_args(argv)
+
+    print(f"🛣  Corridor of {args.junctions} junctions, {args.duration}s, {args.seeds} seeds")
+    for coordinated in (False, True):
+        runs = [simulate(args.junctions, args.duration, coordinated, seed, args.travel_time,
+                         boost=args.boost, max_hold=args.hold, max_cross_red=args.max_cross_red)
+                for seed in range(args.seeds)]
+        stops = sum(r["mean_stops"] for r in runs) / len(runs)
+        delay = sum(r["mean_delay"] for r in runs) / len(runs)
+        cross = sum(r["cross_mean_wait"] for r in runs) / len(runs)
+        longest = max(r["cross_max_wait"] for r in runs)
+        label = "coordinated  " if coordinated else "isolated     "
+        print(f"{label} arterial stops/vehicle={stops:.2f}  delay/vehicle={delay:.1f}s  |  "
+              f"cross-street wait mean={cross:.1f}s  max={longest}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import os, time, csv, signal, sys
+import os, time, csv, json, signal, sys
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
@@ -16,11 +16,27 @@ sensors = {"ir1": 0, "ir2": 0, "ir3": 0, "ir4": 0}
 current_lane = None         # "Lane1"... "Lane4"
 cycle_start_ts = None       # epoch seconds
 start_snapshot = sensors.copy()
+pending_reason = ""         # reason from the latest decision/signal message
+cycle_reason = ""           # reason that started the current cycle
+
+FIELDNAMES = ["timestamp", "ir1", "ir2", "ir3", "ir4", "active_lane", "green_time", "reason"]
+
+# files from before the reason column existed are rewritten in place with an empty reason
+if os.path.exists(CSV_PATH) and os.path.getsize(CSV_PATH) > 0:
+    with open(CSV_PATH, newline="", encoding="utf-8") as fp:
+        rows = list(csv.DictReader(fp))
+    if rows and "reason" not in rows[0]:
+        tmp_path = CSV_PATH + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as fp:
+            w = csv.DictWriter(fp, fieldnames=FIELDNAMES, extrasaction="ignore")
+            w.writeheader()
+            for r in rows:
+                w.writerow({**r, "reason": ""})
+        os.replace(tmp_path, CSV_PATH)
+        print(f"📦 Added reason column to {CSV_PATH} ({len(rows)} rows)")
 
 csv_fp = open(CSV_PATH, "a", newline="", encoding="utf-8")
-writer = csv.DictWriter(csv_fp, fieldnames=[
-    "timestamp", "ir1", "ir2", "ir3", "ir4", "active_lane", "green_time"
-])
+writer = csv.DictWriter(csv_fp, fieldnames=FIELDNAMES)
 if csv_fp.tell() == 0:
     writer.writeheader()
 
@@ -38,7 +54,8 @@ def flush_row(end_ts=None):
         "ir3": int(start_snapshot["ir3"]),
         "ir4": int(start_snapshot["ir4"]),
         "active_lane": current_lane,
-        "green_time": green_time
+        "green_time": green_time,
+        "reason": cycle_reason
     }
     writer.writerow(row)
     csv_fp.flush()
@@ -50,12 +67,19 @@ def on_connect(client, userdata, flags, reason_code, properties=None):
     client.subscribe("traffic/ir3")
     client.subscribe("traffic/ir4")
     client.subscribe("signal/current")  # published by your optimizer
+    client.subscribe("decision/signal") # carries the decision reason
 
 def on_message(client, userdata, msg):
-    global current_lane, cycle_start_ts, start_snapshot
+    global current_lane, cycle_start_ts, start_snapshot, pending_reason, cycle_reason
     topic = msg.topic
     payload = msg.payload.decode().strip()
 
+    if topic == "decision/signal":
+        try:
+            pending_reason = str(json.loads(payload).get("reason", ""))
+        except:
+            pending_reason = ""
+
     if topic.startswith("traffic/ir"):
         key = topic.split("/")[-1]
         try:
@@ -71,6 +95,7 @@ def on_message(client, userdata, msg):
             current_lane = new_lane
             cycle_start_ts = now
             start_snapshot = sensors.copy()
+            cycle_reason = pending_reason
             print(f"▶️  Start {current_lane} @ {datetime.now().strftime('%H:%M:%S')} snapshot={start_snapshot}")
         # lane changed -> close previous row, start new cycle
         elif (new_lane != current_lane) and (new_lane is not None) and (new_lane != "—"):
@@ -80,6 +105,7 @@ def on_message(client, userdata, msg):
             current_lane = new_lane
             cycle_start_ts = now
             start_snapshot = sensors.copy()
+            cycle_reason = pending_reason
             print(f"▶️  Start {current_lane} @ {datetime.now().strftime('%H:%M:%S')} snapshot={start_snapshot}")
 
 def shutdown(*_):
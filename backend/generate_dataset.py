@@ -6,6 +6,8 @@ os.makedirs(DATA_DIR, exist_ok=True)
 CSV_PATH = os.path.join(DATA_DIR, "signal_decisions.csv")
 
 lanes = ["Lane1", "Lane2", "Lane3", "Lane4"]
+# same columns data_recorder.py writes; synthetic rows have no decision reason
+FIELDNAMES = ["timestamp", "ir1", "ir2", "ir3", "ir4", "active_lane", "green_time", "reason"]
 
 def generate_row(ts, period):
     """
@@ -45,15 +47,13 @@ def generate_row(ts, period):
         "ir3": ir[2],
         "ir4": ir[3],
         "active_lane": active_lane,
-        "green_time": green_time
+        "green_time": green_time,
+        "reason": ""
     }
 
 def main():
     with open(CSV_PATH, "w", newline="") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=["timestamp","ir1","ir2","ir3","ir4","active_lane","green_time"]
-        )
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
 
         ts = datetime.now()
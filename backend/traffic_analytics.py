@@ -0,0 +1,424 @@
+import os, io, sys, json, glob, hashlib, argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# ==== CONFIG ==== #
+DATA_DIR = "data"
+STORE_DIR = os.path.join(DATA_DIR, "analytics")
+INDEX_NAME = "index.json"
+DEFAULT_SOURCES = [os.path.join(DATA_DIR, "*.csv"), os.path.join(DATA_DIR, "*", "signal_decisions.csv")]
+READ_BLOCK = 64 * 1024 * 1024   # bytes parsed per chunk on big files
+HEAD_BYTES = 4096               # prefix hashed to notice rewritten files
+COMPACT_CHUNKS = 8              # chunks from one file in one partition before ingest merges them
+STARVATION_GAP = 120            # seconds without green before a lane counts as starved
+# ================ #
+
+LANES = ["Lane1", "Lane2", "Lane3", "Lane4"]
+IR_COLS = ["ir1", "ir2", "ir3", "ir4"]
+REQUIRED_COLS = ["timestamp", *IR_COLS, "active_lane", "green_time"]
+COLUMNS = ("ts", "ir", "lane", "green", "reason")
+# reason codes stored per row; files written before the recorder logged reasons get 0
+REASONS = ["unknown", "model+rushhour", "fairness override", "emergency override", "other"]
+
+# ---- Ingest ---- #
+def junction_of(path):
+    """data/J12/signal_decisions.csv -> J12, data/J12.csv -> J12"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name == "signal_decisions":
+        parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        return parent if parent and parent != os.path.basename(DATA_DIR) else "default"
+    return name
+
+def source_key(path):
+    return os.path.abspath(path)
+
+def source_tag(path):
+    # short stable id so chunk files from one source can be found & dropped
+    return hashlib.sha1(source_key(path).encode()).hexdigest()[:10]
+
+def head_digest(path, length):
+    # fingerprint of the already-ingested prefix, catches files rewritten in place
+    with open(path, "rb") as fp:
+        return hashlib.sha1(fp.read(min(length, HEAD_BYTES))).hexdigest()
+
+def reason_codes(values):
+    codes = np.zeros(len(values), dtype=np.int8)
+    for code, name in enumerate(REASONS[1:-1], start=1):
+        codes[values == name] = code
+    known = pd.notna(values) & (values != "") & (codes == 0)
+    codes[known] = len(REASONS) - 1
+    return codes
+
+def number_col(col):
+    # only fall back to the slow path when a column holds junk values
+    if not pd.api.types.is_numeric_dtype(col):
+        col = pd.to_numeric(col, errors="coerce")
+    return col.fillna(0).to_numpy()
+
+def parse_block(data, header):
+    """Turn raw CSV bytes (no header line) into columnar numpy arrays."""
+    text_cols = {c: str for c in ("timestamp", "active_lane", "reason") if c in header}
+    df = pd.read_csv(io.BytesIO(data), names=header, header=None, dtype=text_cols,
+                     keep_default_na=False, engine="c")
+    # recorder & generator both write "%Y-%m-%d %H:%M:%S"; the fixed format is much faster
+    ts = pd.to_datetime(df["timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    if ts.isna().any():
+        ts = ts.fillna(pd.to_datetime(df["timestamp"][ts.isna()], format="mixed", errors="coerce"))
+    ok = ts.notna().to_numpy()
+    df, ts = df[ok], ts[ok]
+    ir = np.stack([number_col(df[c]) for c in IR_COLS], axis=1)
+    lane = df["active_lane"].map({name: i for i, name in enumerate(LANES)}).fillna(-1).to_numpy()
+    reason = df["reason"].to_numpy() if "reason" in df.columns else np.array([""] * len(df), dtype=object)
+    return {
+        "ts": ts.to_numpy().astype("datetime64[s]").astype(np.int64),
+        "ir": np.clip(ir, 0, 255).astype(np.uint8),
+        "lane": lane.astype(np.int8),
+        "green": number_col(df["green_time"]).astype(np.int32),
+        "reason": reason_codes(reason),
+    }
+
+def write_partitions(store, junction, tag, offset, cols):
+    """Split columns by day and write one chunk file per (junction, day)."""
+    out = []
+    if len(cols["ts"]) == 0:
+        return out
+    order = np.argsort(cols["ts"] // 86400, kind="stable")
+    cols = {k: v[order] for k, v in cols.items()}
+    days = cols["ts"] // 86400
+    bounds = np.flatnonzero(np.diff(days)) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(days)]):
+        sel, day = slice(lo, hi), days[lo]
+        day_str = str(np.datetime64(int(day), "D"))
+        part = f"{junction}/{day_str}"
+        part_dir = os.path.join(store, junction, day_str)
+        os.makedirs(part_dir, exist_ok=True)
+        fname = f"{tag}-{offset:012d}.npz"
+        np.savez(os.path.join(part_dir, fname), **{k: v[sel] for k, v in cols.items()})
+        out.append({"partition": part, "file": fname, "rows": int(hi - lo)})
+    return out
+
+def ingest_file(path, store, state):
+    """
+    Read only the bytes appended since the last run (state["offset"]) and
+    write them out as columnar chunks. Runs inside a worker process.
+    """
+    junction = state.get("junction") or junction_of(path)
+    tag = source_tag(path)
+    offset = state.get("offset", 0)
+    header = state.get("header")
+    chunks = []
+    try:
+        with open(path, "rb") as fp:
+            if header is None:
+                first = fp.readline()
+                if not first.endswith(b"\n"):
+                    return {"path": path, "state": state, "chunks": chunks}
+                header = first.decode("utf-8-sig").strip().split(",")
+                missing = [c for c in REQUIRED_COLS if c not in header]
+                if missing:
+                    raise ValueError(f"missing column(s) {', '.join(missing)}")
+                offset = fp.tell()
+            fp.seek(offset)
+            while True:
+                data = fp.read(READ_BLOCK)
+                if not data:
+                    break
+                cut = data.rfind(b"\n")
+                if cut < 0:
+                    break   # partial last line, pick it up next time
+                data = data[:cut + 1]
+                chunks += write_partitions(store, junction, tag, offset, parse_block(data, header))
+                offset += len(data)
+                fp.seek(offset)
+    except Exception:
+        # don't leave chunks behind that the index will never know about
+        for c in chunks:
+            try:
+                os.remove(os.path.join(store, *c["partition"].split("/"), c["file"]))
+            except FileNotFoundError:
+                pass
+        raise
+    new_state = {"junction": junction, "header": header, "offset": offset,
+                 "inode": os.stat(path).st_ino, "head": head_digest(path, offset)}
+    return {"path": path, "state": new_state, "chunks": chunks}
+
+def load_index(store):
+    path = os.path.join(store, INDEX_NAME)
+    if not os.path.exists(path):
+        return {"sources": {}, "partitions": {}}
+    with open(path, encoding="utf-8") as fp:
+        return json.load(fp)
+
+def save_index(store, index):
+    path = os.path.join(store, INDEX_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        json.dump(index, fp, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def drop_source(store, index, path):
+    """Forget everything ingested from a file that was truncated or replaced."""
+    tag = source_tag(path) + "-"
+    for part, chunks in list(index["partitions"].items()):
+        keep = []
+        for c in chunks:
+            if c["file"].startswith(tag):
+                try:
+                    os.remove(os.path.join(store, *part.split("/"), c["file"]))
+                except FileNotFoundError:
+                    pass
+            else:
+                keep.append(c)
+        if keep:
+            index["partitions"][part] = keep
+        else:
+            del index["partitions"][part]
+    index["sources"].pop(source_key(path), None)
+
+def read_chunk(path):
+    # copy the arrays out so the file handle is closed right away
+    with np.load(path) as d:
+        return {k: d[k] for k in COLUMNS}
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def chunk_range(fname):
+    """tag-<offset>.npz or tag-<first>-<last>.npz (merged) -> (first, last)"""
+    offsets = os.path.splitext(fname)[0].split("-")[1:]
+    return int(offsets[0]), int(offsets[-1])
+
+def compact(store, index, parts=None, min_chunks=COMPACT_CHUNKS):
+    """
+    Merge the chunks each source file has in a partition into one, once
+    there are at least min_chunks of them. Chunks stay per source so
+    drop_source() can still find them. Updates the index in place and
+    returns the files it replaced; delete those only after the index is saved.
+    """
+    stale = []
+    for part in (parts if parts is not None else list(index["partitions"])):
+        chunks = index["partitions"].get(part, [])
+        by_tag = {}
+        for c in chunks:
+            by_tag.setdefault(c["file"].split("-")[0], []).append(c)
+        keep = [c for group in by_tag.values() if len(group) < min_chunks for c in group]
+        for tag, group in by_tag.items():
+            if len(group) < min_chunks:
+                continue
+            part_dir = os.path.join(store, *part.split("/"))
+            loaded = [read_chunk(os.path.join(part_dir, c["file"])) for c in group]
+            cols = {k: np.concatenate([d[k] for d in loaded]) for k in COLUMNS}
+            order = np.argsort(cols["ts"], kind="stable")
+            first = min(chunk_range(c["file"])[0] for c in group)
+            last = max(chunk_range(c["file"])[1] for c in group)
+            fname = f"{tag}-{first:012d}-{last:012d}.npz"
+            np.savez(os.path.join(part_dir, fname), **{k: v[order] for k, v in cols.items()})
+            keep.append({"file": fname, "rows": int(len(order))})
+            stale += [os.path.join(part_dir, c["file"]) for c in group]
+        index["partitions"][part] = keep
+    return stale
+
+def ingest(paths, store=STORE_DIR, workers=None):
+    os.makedirs(store, exist_ok=True)
+    index = load_index(store)
+    jobs = []
+    for path in sorted(set(paths)):
+        key = source_key(path)
+        st = os.stat(path)
+        state = index["sources"].get(key, {})
+        if state and (state.get("inode") != st.st_ino or st.st_size < state["offset"]
+                      or head_digest(path, state["offset"]) != state.get("head")):
+            print(f"♻️  {path} was rewritten, re-ingesting")
+            drop_source(store, index, path)
+            state = {}
+        if state and st.st_size == state["offset"]:
+            continue    # nothing new
+        jobs.append((path, state))
+
+    rows = failed = 0
+    touched = set()
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(path, pool.submit(ingest_file, path, store, state)) for path, state in jobs]
+            for path, fut in futures:
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    print(f"❌ Skipped {path}: {type(e).__name__}: {e}")
+                    failed += 1
+                    continue
+                index["sources"][source_key(res["path"])] = res["state"]
+                for c in res["chunks"]:
+                    part = c.pop("partition")
+                    index["partitions"].setdefault(part, []).append(c)
+                    touched.add(part)
+                    rows += c["rows"]
+        stale = compact(store, index, sorted(touched))
+        save_index(store, index)
+        remove_files(stale)
+    print(f"✅ Ingested {rows} new rows from {len(jobs) - failed} file(s) → {store}")
+    return rows
+
+# ---- Query ---- #
+def day_of(value):
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d") if value else None
+
+def load_rows(store, junction=None, since=None, until=None):
+    """
+    Concatenate the chunks of every partition that matches the filters.
+    Partitions are pruned from the index alone, without opening any file.
+    Returns {junction: columns} with rows sorted by timestamp.
+    """
+    index = load_index(store)
+    since, until = day_of(since), day_of(until)
+    parts = {}
+    for part, chunks in index["partitions"].items():
+        j, day = part.split("/")
+        if junction and j not in junction:
+            continue
+        if (since and day < since) or (until and day > until):
+            continue
+        for c in chunks:
+            parts.setdefault(j, []).append(os.path.join(store, j, day, c["file"]))
+
+    out = {}
+    for j, files in sorted(parts.items()):
+        loaded = [read_chunk(f) for f in files]
+        cols = {k: np.concatenate([d[k] for d in loaded]) for k in COLUMNS}
+        order = np.argsort(cols["ts"], kind="stable")
+        out[j] = {k: v[order] for k, v in cols.items()}
+    return out
+
+def green_share(cols):
+    lane, green = cols["lane"], cols["green"].astype(np.int64)
+    valid = lane >= 0
+    per_lane = np.bincount(lane[valid], weights=green[valid], minlength=4)
+    cycles = np.bincount(lane[valid], minlength=4)
+    total = per_lane.sum() or 1
+    return [(LANES[i], int(cycles[i]), int(per_lane[i]), per_lane[i] / total) for i in range(4)]
+
+def starvation(cols, threshold=STARVATION_GAP):
+    """
+    Gap = time a lane waits without green: from the start of the queried
+    span to its first green, between the end of one green and the start of
+    the next, and from its last green to the end of the span. A lane that
+    never got green waits the whole span. Reports the longest gap, the mean
+    gap and how many exceed threshold.
+    """
+    span_start = int(cols["ts"].min())
+    span_end = int((cols["ts"] + cols["green"]).max())
+    out = []
+    for i in range(4):
+        sel = cols["lane"] == i
+        start = cols["ts"][sel].astype(np.int64)
+        end = start + cols["green"][sel]
+        gaps = np.maximum(np.r_[start, span_end] - np.r_[span_start, end], 0)
+        out.append((LANES[i], int(gaps.max()), float(gaps.mean()), int((gaps > threshold).sum())))
+    return out
+
+def peak_hours(cols, top=5):
+    """Demand per hour of day as occupied-lane-seconds (sum(ir) * green_time)."""
+    hour = (cols["ts"] % 86400) // 3600
+    occupied = cols["ir"].sum(axis=1).astype(np.int64)
+    demand = np.bincount(hour, weights=occupied * cols["green"], minlength=24)
+    cycles = np.bincount(hour, minlength=24)
+    mean_occ = np.bincount(hour, weights=occupied, minlength=24) / np.maximum(cycles, 1)
+    order = np.argsort(-demand, kind="stable")[:top]
+    return [(int(h), int(cycles[h]), float(mean_occ[h]), int(demand[h])) for h in order if cycles[h]]
+
+def override_frequency(cols):
+    counts = np.bincount(cols["reason"].astype(np.int64), minlength=len(REASONS))
+    known = counts[1:].sum()
+    return [(name, int(counts[i]), counts[i] / known if known and i else 0.0)
+            for i, name in enumerate(REASONS) if counts[i]]
+
+# ---- CLI ---- #
+def print_table(title, header, rows):
+    print(f"\n📊 {title}")
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+              for i, h in enumerate(header)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(header, widths)))
+    for r in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(r, widths)))
+
+def run_query(args):
+    data = load_rows(args.store, args.junction, args.since, args.until)
+    if not data:
+        print("⚠️  No data in store for these filters (run ingest first)")
+        return
+    for j, cols in data.items():
+        span = f"{np.datetime64(int(cols['ts'][0]), 's')} … {np.datetime64(int(cols['ts'][-1]), 's')}"
+        title = f"{j} ({len(cols['ts'])} cycles, {span})"
+        if args.command == "green-share":
+            rows = [(l, c, g, f"{s*100:.1f}%") for l, c, g, s in green_share(cols)]
+            print_table(title, ["lane", "cycles", "green_s", "share"], rows)
+        elif args.command == "starvation":
+            rows = [(l, m, f"{a:.1f}", n) for l, m, a, n in starvation(cols, args.threshold)]
+            print_table(title, ["lane", "max_gap_s", "mean_gap_s", f"gaps>{args.threshold}s"], rows)
+        elif args.command == "peak-hours":
+            rows = [(f"{h:02d}:00", c, f"{o:.2f}", d) for h, c, o, d in peak_hours(cols, args.top)]
+            print_table(title, ["hour", "cycles", "mean_occupied", "demand_lane_s"], rows)
+        elif args.command == "overrides":
+            rows = [(n, c, f"{f*100:.1f}%" if n != "unknown" else "-") for n, c, f in override_frequency(cols)]
+            print_table(title, ["reason", "cycles", "share_of_known"], rows)
+
+def expand_sources(patterns):
+    paths = []
+    for p in patterns:
+        paths += [f for f in glob.glob(p) if os.path.isfile(f)]
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest recorder CSVs and query traffic analytics")
+    parser.add_argument("--store", default=STORE_DIR, help="columnar store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="ingest new bytes from recorder CSV files")
+    p.add_argument("sources", nargs="*", default=DEFAULT_SOURCES, help="files or glob patterns")
+    p.add_argument("--workers", type=int, default=None, help="parallel worker processes")
+
+    p = sub.add_parser("compact", help="merge every partition's chunks into one per source file")
+
+    for name, text in [("green-share", "per-lane share of green time"),
+                       ("starvation", "longest wait between greens per lane"),
+                       ("peak-hours", "hours of day with most demand"),
+                       ("overrides", "frequency of fairness/emergency overrides")]:
+        q = sub.add_parser(name, help=text)
+        q.add_argument("--junction", action="append", help="limit to junction (repeatable)")
+        q.add_argument("--since", help="first day, YYYY-MM-DD")
+        q.add_argument("--until", help="last day, YYYY-MM-DD")
+        if name == "starvation":
+            q.add_argument("--threshold", type=int, default=STARVATION_GAP, help="gap in seconds")
+        if name == "peak-hours":
+            q.add_argument("--top", type=int, default=5)
+
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        paths = expand_sources(args.sources)
+        if not paths:
+            print("⚠️  No recorder files matched:", " ".join(args.sources))
+            return 1
+        ingest(paths, args.store, args.workers)
+    elif args.command == "compact":
+        index = load_index(args.store)
+        if not index["partitions"]:
+            print("⚠️  No data in store to compact (run ingest first)")
+            return 0
+        before = sum(len(c) for c in index["partitions"].values())
+        stale = compact(args.store, index, min_chunks=2)
+        save_index(args.store, index)
+        remove_files(stale)
+        after = sum(len(c) for c in index["partitions"].values())
+        print(f"✅ Compacted {before} chunk(s) into {after} → {args.store}")
+    else:
+        run_query(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
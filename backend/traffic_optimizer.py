@@ -1,4 +1,5 @@
 
+import os
 import time
 import json
 import signal
@@ -7,12 +8,14 @@ from datetime import datetime
 import numpy as np
 import paho.mqtt.client as mqtt
 import tensorflow as tf
+from corridor_coordinator import Corridor
 
 BROKER = "192.168.169.139"
 PORT = 1883
 KEEPALIVE = 60
 
 MANUAL_AW = 15.0 
+CORRIDOR_FILE = "corridor.json"      # this junction's id + links to neighbours (optional)
 # ---- Load models (compile=False avoids Keras metric deserialization issues) ----
 lane_model = tf.keras.models.load_model("model/traffic_model.h5", compile=False)
 time_model = tf.keras.models.load_model("model/time_model.h5", compile=False)
@@ -30,12 +33,20 @@ served_total = 0
 avg_wait = 0.0
 last_decision_time = time.time()
 emergency_lane = None            # e.g., "Lane2" if emergency topic triggers, otherwise None
+red_since = [time.time()] * 4    # when each lane last lost green (for corridor coordination)
 
 MIN_GREEN = 7
 MAX_GREEN = 40
 MAX_SAME_LANE = 3                # avoid starving others
 COOLDOWN_BETWEEN_DECISIONS = 1   # seconds to avoid spam if called twice
 
+# ---- Corridor coordination (green wave) ----
+corridor = Corridor.from_file(CORRIDOR_FILE) if os.path.exists(CORRIDOR_FILE) else None
+JUNCTION_ID = corridor.junction if corridor is not None else None   # name used on corridor/<id>/schedule
+if corridor is not None and not JUNCTION_ID:
+    # a shared default id would let junctions overwrite each other's schedules
+    raise SystemExit(f"❌ {CORRIDOR_FILE} needs a \"junction\" id for this site, e.g. \"junction\": \"J2\"")
+
 # ---- MQTT setup ----
 def on_message(client, userdata, msg):
     global traffic_state, emergency_lane
@@ -57,11 +68,21 @@ def on_message(client, userdata, msg):
         elif payload in ["Lane1","Lane2","Lane3","Lane4"]:
             emergency_lane = payload
 
+    if topic.startswith("corridor/") and corridor is not None:
+        # upstream junction's phase schedule (epoch start time + green length)
+        try:
+            s = json.loads(payload)
+            corridor.publish(s["junction"], s["lane"], float(s["start"]), int(s["green"]))
+        except:
+            pass
+
 client = mqtt.Client()
 client.on_message = on_message
 client.connect(BROKER, PORT, KEEPALIVE)
 for t in ["traffic/ir1","traffic/ir2","traffic/ir3","traffic/ir4","traffic/emergency"]:
     client.subscribe(t)
+if corridor is not None:
+    client.subscribe("corridor/+/schedule")
 client.loop_start()
 
 def graceful_exit(signum, frame):
@@ -92,12 +113,20 @@ def choose_lane(ir_vec):
     """Use model prediction, but add rush-hour weighting and fairness."""
     global last_lane, repeat_count
 
+    # the previous green has just ended
+    if last_lane is not None:
+        red_since[list(lane_classes).index(last_lane)] = time.time()
+
     # Model prediction
     logits = lane_model.predict(ir_vec.reshape(1, -1), verbose=0)[0]
     probs = tf.nn.softmax(logits).numpy()
 
     # Rush-hour weighting
     w = rush_hour_weight(datetime.now().hour)
+    if corridor is not None:
+        now = time.time()
+        longest_red = max([now - red_since[i] for i in range(4) if ir_vec[i]], default=0)
+        w = w * np.array(corridor.weights(JUNCTION_ID, now, longest_red), dtype=float)
     weighted = probs * w
     weighted = weighted / (weighted.sum() + 1e-9)
 
@@ -150,6 +179,18 @@ def publish_decision(lane_name, green_time, ir_vec, reason):
     })
     client.publish("decision/signal", payload)
 
+def publish_schedule(lane_name, green_time, start_ts):
+    # lets downstream junctions expect the platoon we are releasing
+    if JUNCTION_ID is None:
+        return
+    payload = json.dumps({
+        "junction": JUNCTION_ID,
+        "lane": lane_name,
+        "start": round(start_ts, 3),
+        "green": int(green_time)
+    })
+    client.publish(f"corridor/{JUNCTION_ID}/schedule", payload)
+
 def set_lights(active_lane, green_time):
     # publish lane states, current & countdown
     for i in range(1,5):
@@ -204,12 +245,15 @@ def main_loop():
         lane_name, reason = choose_lane(ir_vec)
         green_time = choose_time(ir_vec)
         last_decision_time = time.time()
+        if corridor is not None and lane_name != emergency_lane:
+            green_time = corridor.green_for(JUNCTION_ID, lane_name, last_decision_time, green_time, MAX_GREEN)
 
         # Publish to dashboard
         publish_decision(lane_name, green_time, ir_vec, reason)
 
         # Set lights & countdown
         set_lights(lane_name, green_time)
+        publish_schedule(lane_name, green_time, last_decision_time)
         print(f"🚦 {lane_name} → GREEN for {green_time}s ({reason})")
 
         # countdown ticks for front-end sync